@@ -11,14 +11,15 @@ Notes:
 - Unknown parents are deferred across passes; remaining orphans attach to Root unless --strict is used.
 - The output includes BandQ-style fields: label, code, level, children, path (label_translations retained if present).
 """
-import json
 import argparse
 from pathlib import Path
 from collections import defaultdict
 
+import orjson
+
 def load_json(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
 
 def normalize_flat(nodes):
     # nodes may be a dict with "hierarchies" list or a list
@@ -78,19 +79,24 @@ def get_or_create_node(code_index, code, label=None, level=None, label_translati
     code_index[code] = node
     return node
 
-def set_paths_and_levels(node, parent_path="", depth=0):
-    label = node.get("label") or node.get("code") or ""
-    node["path"] = f"{parent_path} > {label}" if parent_path else label
-    if node.get("level") is None:
-        node["level"] = depth
-    for ch in node.get("children", []):
-        set_paths_and_levels(ch, node["path"], depth + 1)
-
-def sort_children(node):
-    if "children" in node:
-        node["children"].sort(key=lambda x: (x.get("level", 9999), x.get("label", ""), x.get("code", "")))
-        for ch in node["children"]:
-            sort_children(ch)
+def set_paths_and_levels(root, root_depth=0):
+    # Iterative pre-order walk (same visit order as recursion); each node's path
+    # is built once from its parent's already-computed path.
+    stack = [(root, "", root_depth)]
+    while stack:
+        node, parent_path, depth = stack.pop()
+        label = node.get("label") or node.get("code") or ""
+        node["path"] = f"{parent_path} > {label}" if parent_path else label
+        if node.get("level") is None:
+            node["level"] = depth
+        for ch in reversed(node.get("children", [])):
+            stack.append((ch, node["path"], depth + 1))
+
+def sort_children(root):
+    # Sorting never changes which nodes exist, so collect them first and sort each list once
+    for node in list(iter_nodes(root)):
+        if "children" in node:
+            node["children"].sort(key=lambda x: (x.get("level", 9999), x.get("label", ""), x.get("code", "")))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -116,6 +122,8 @@ def main():
     flat_nodes.sort(key=lambda n: (n.get("level", 9999), n.get("label") or "", n["code"]))
 
     pending = flat_nodes[:]
+    # parent code -> codes already attached under it (avoids rescanning children lists)
+    child_codes = defaultdict(set)
     progress = True
     unknown_parents = set()
 
@@ -135,7 +143,9 @@ def main():
                 continue
             child = get_or_create_node(code_index, n["code"], n.get("label"), n.get("level"), n.get("label_translations"))
             parent.setdefault("children", [])
-            if all(ch.get("code") != child["code"] for ch in parent["children"]):
+            seen = child_codes[parent["code"]]
+            if child["code"] not in seen:
+                seen.add(child["code"])
                 parent["children"].append(child)
             progress = True
         pending = next_pending
@@ -145,19 +155,21 @@ def main():
             missing = sorted(set([n["parent_code"] for n in pending if n.get("parent_code")]))
             raise SystemExit(f"Aborting due to unknown parent_code(s): {missing[:20]} (and possibly more).")
         # Attach orphans to root to avoid data loss
+        root_codes = child_codes[base["code"]]
         for n in pending:
             child = get_or_create_node(code_index, n["code"], n.get("label"), n.get("level"), n.get("label_translations"))
-            if all(ch.get("code") != child["code"] for ch in base.get("children", [])):
+            if child["code"] not in root_codes:
+                root_codes.add(child["code"])
                 base.setdefault("children", []).append(child)
 
     # Finalize with BandQ-style path + level
-    set_paths_and_levels(base, "", 0)
+    set_paths_and_levels(base, 0)
     sort_children(base)
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(base, f, indent=2, ensure_ascii=False)
+    with open(out_path, "wb") as f:
+        f.write(orjson.dumps(base, option=orjson.OPT_INDENT_2))
 
     print(f"✅ Wrote hierarchical taxonomy to {out_path}")
 
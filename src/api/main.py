@@ -1,4 +1,5 @@
 from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask.json.provider import DefaultJSONProvider
 from pydantic import ValidationError
 from pathlib import Path
 from ..config import (
@@ -17,45 +18,57 @@ from ..config import (
     OPENAI_API_KEY,
     ANTHROPIC_API_KEY,
 )
-from ..core.models import ItemInput, CategorizationResponse, MarketplaceCategoryResult, UsageInfo
-from ..core.loaders import load_marketplaces, load_taxonomy
-from ..core.categorizer import choose_category_for_marketplace
+from ..core.models import ItemInput, CategorizationResponse, category_result, usage_info
+from ..core.loaders import load_marketplaces, load_marketplace_index, load_taxonomy_leaves
+from ..core.categorizer import (
+    choose_category_for_marketplace,
+    choose_categories_for_marketplaces,
+    prepare_leaves,
+)
 import os
 from html import unescape as html_unescape
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List
 
-_TAG = re.compile(r"<[^>]+>")
+import orjson
+
+# Upper bound on marketplaces categorized concurrently within one request
+_MAX_MP_WORKERS = int(os.getenv("MAX_MARKETPLACE_WORKERS", "8"))
+# Cache-Control max-age for /ui/* assets. They are not fingerprinted, so keep this modest
+_UI_MAX_AGE = int(os.getenv("UI_CACHE_MAX_AGE", "3600"))
+# Send all marketplaces for an item in one LLM call instead of one call each
+_BATCH_MARKETPLACES = os.getenv("LLM_BATCH_MARKETPLACES", "").lower() in ("1", "true", "yes")
+
+# Tags and whitespace runs (in any mix) collapse to a single space in one pass
+_CLEAN = re.compile(r"(?:<[^>]+>|\s)+")
 
 
 def _strip_html(s: str | None) -> str:
     if not s:
         return ""
-    s = html_unescape(s)
-    s = _TAG.sub(" ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _CLEAN.sub(" ", html_unescape(s)).strip()
 
 
-def _get_trim(obj: Dict[str, Any], key: str) -> str:
-    if key in obj and obj[key] is not None:
-        return str(obj[key]).strip()
-    return ""
+_IMAGE_KEYS = tuple(f"Image{i}FullSource" for i in range(1, 11))
 
+# (payload key, attribute name, keep when blank). Absent keys are always omitted;
+# a blank country or bulletpoints value is dropped, blank price/stock id are kept.
+_ATTR_KEYS = (
+    ("Price", "price", True),
+    ("Country of Manufacture", "country_of_manufacture", False),
+    ("StockItemId", "stock_item_id", True),
+    ("bulletpoints", "bulletpoints", False),
+)
 
-def _collect_images(obj: Dict[str, Any]) -> List[str]:
-    imgs: List[str] = []
-    for i in range(1, 11):
-        k = f"Image{i}FullSource"
-        if k in obj and obj[k] is not None:
-            val = str(obj[k]).strip()
-            if val:
-                imgs.append(val)
-    return imgs
+
+def _get_trim(obj: Dict[str, Any], key: str) -> str:
+    val = obj.get(key)
+    return "" if val is None else str(val).strip()
 
 
-def _lower(s: str) -> str:
-    return s.lower() if isinstance(s, str) else s
+def _collect_images(obj: Dict[str, Any]) -> List[str]:
+    return [v for v in (_get_trim(obj, k) for k in _IMAGE_KEYS) if v]
 
 
 def _map_external_item_to_iteminput(raw: Dict[str, Any]) -> ItemInput:
@@ -67,34 +80,22 @@ def _map_external_item_to_iteminput(raw: Dict[str, Any]) -> ItemInput:
     # Brand may be blank — pass through as empty string
     brand = _get_trim(raw, "Brand")
 
-    # Description: strip HTML from both descriptions and combine
+    # Description: combine both descriptions, then strip HTML in a single pass
     desc_html = _get_trim(raw, "Description")
     listing_desc_html = _get_trim(raw, "Listing Description")
-    description = " ".join(
-        [_strip_html(desc_html),
-         _strip_html(listing_desc_html)]).strip()
+    description = _strip_html(f"{desc_html} {listing_desc_html}") if (desc_html or listing_desc_html) else ""
 
     # Images: array of up to 10; first one becomes image_url
     images = _collect_images(raw)  # at least one per your upstream guarantee
     image_url = images[0] if images else None
 
-    # Attributes: include keys if present in the payload (even if blank),
-    # except "bulletpoints": if blank, omit it entirely.
+    # Attributes: include keys present in the payload (see _ATTR_KEYS for blank handling)
     attrs: Dict[str, Any] = {}
-    if "Price" in raw:
-        attrs["price"] = _get_trim(raw, "Price")
-    if "Country of Manufacture" in raw:
-        com = _get_trim(raw, "Country of Manufacture")
-        if com:
-            attrs["country_of_manufacture"] = com
-        else:
-            # key present but blank → omit per your instruction to ignore blank country
-            pass
-    if "StockItemId" in raw:
-        attrs["stock_item_id"] = _get_trim(raw, "StockItemId")
-    bp_concat = _get_trim(raw, "bulletpoints")
-    if bp_concat:  # include only if non-blank
-        attrs["bulletpoints"] = bp_concat
+    for key, attr, keep_blank in _ATTR_KEYS:
+        if key in raw:
+            val = _get_trim(raw, key)
+            if val or keep_blank:
+                attrs[attr] = val
 
     # Always include the full images array for context
     attrs["images"] = images
@@ -110,7 +111,48 @@ def _map_external_item_to_iteminput(raw: Dict[str, Any]) -> ItemInput:
     )
 
 
+def _warm_caches() -> None:
+    """
+    Load every configured taxonomy and its prefilter index at import time.
+    Under gunicorn --preload this happens once in the master and forked
+    workers share the result instead of each paying it on first request.
+    """
+    try:
+        for mp in load_marketplaces().get("marketplaces", []) or []:
+            path = mp.get("taxonomy_file")
+            if not path or not os.path.exists(path):
+                continue
+            prepare_leaves(load_taxonomy_leaves(
+                path,
+                mp.get("id_field", "id"),
+                mp.get("name_field", "name"),
+                mp.get("children_field", "children"),
+            ))
+    except Exception as e:
+        # Requests still load lazily; don't stop the app from booting
+        print(f"[WARN] Taxonomy cache warm-up failed: {e}")
+
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON (jsonify, dict returns, request.get_json) through orjson. Types orjson
+    can't handle natively fall back to Flask's default conversions.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = _OrjsonProvider(app)
+_warm_caches()
 
 # Compute absolute path to UI directory
 ui_dir = Path(__file__).resolve().parents[2] / 'ui'
@@ -125,8 +167,8 @@ def index():
 
 @app.route('/ui/<path:filename>')
 def ui_static(filename):
-    """Serve static files from ui directory"""
-    return send_from_directory(ui_dir, filename)
+    """Serve static files from ui directory (browser-cacheable; revalidated via ETag after expiry)"""
+    return send_from_directory(ui_dir, filename, max_age=_UI_MAX_AGE)
 
 
 @app.get("/health")
@@ -153,6 +195,93 @@ def health_llm():
     }
 
 
+def _skipped_missing_taxonomy(mp: Dict[str, Any], include_confidence: bool):
+    missing = category_result(
+        mp["name"], "UNMAPPED", "N/A", "N/A",
+        note=f"Skipped: taxonomy file not found at '{mp['taxonomy_file']}'")
+    # Track zero usage for skipped marketplaces
+    return missing, usage_info(mp["name"], {}) if include_confidence else None
+
+
+def _categorize_one(item: ItemInput, mp: Dict[str, Any], include_confidence: bool,
+                    llm_overrides: Dict[str, Any]):
+    """
+    Categorize one item for one marketplace. Returns (result_dict, usage dict or None);
+    usage is only tracked in test mode. A missing taxonomy file is skipped with a note.
+    """
+    name = mp["name"]
+    taxonomy_path = mp["taxonomy_file"]
+    id_field = mp.get("id_field", "id")
+    name_field = mp.get("name_field", "name")
+    children_field = mp.get("children_field", "children")
+
+    if not os.path.exists(taxonomy_path):
+        return _skipped_missing_taxonomy(mp, include_confidence)
+
+    leaves = load_taxonomy_leaves(taxonomy_path, id_field, name_field, children_field)
+    result, usage = choose_category_for_marketplace(
+        item,
+        name,
+        leaves=leaves,
+        id_field=id_field,
+        name_field=name_field,
+        children_field=children_field,
+        include_confidence=include_confidence,
+        **llm_overrides,
+    )
+    # Track usage per marketplace when test mode enabled
+    return result, usage_info(name, usage) if include_confidence else None
+
+
+def _categorize_batched(item: ItemInput, mps: List[Dict[str, Any]], include_confidence: bool,
+                        llm_overrides: Dict[str, Any]):
+    """
+    Categorize one item for several marketplaces with a single LLM call.
+    Same (result_dict, usage dict or None) pairs as _categorize_one; in test mode the
+    call's usage is reported once, on the first batched marketplace, labelled with
+    every marketplace it covers.
+    """
+    outcomes: List[Any] = [None] * len(mps)
+    batched = []
+    for i, mp in enumerate(mps):
+        if os.path.exists(mp["taxonomy_file"]):
+            batched.append((i, mp))
+        else:
+            outcomes[i] = _skipped_missing_taxonomy(mp, include_confidence)
+    if not batched:
+        return outcomes
+
+    results, usage = choose_categories_for_marketplaces(
+        item,
+        [
+            {
+                "name": mp["name"],
+                "leaves": load_taxonomy_leaves(
+                    mp["taxonomy_file"],
+                    mp.get("id_field", "id"),
+                    mp.get("name_field", "name"),
+                    mp.get("children_field", "children"),
+                ),
+                "id_field": mp.get("id_field", "id"),
+                "name_field": mp.get("name_field", "name"),
+                "children_field": mp.get("children_field", "children"),
+            }
+            for _, mp in batched
+        ],
+        include_confidence=include_confidence,
+        **llm_overrides,
+    )
+    for (i, _), result in zip(batched, results):
+        outcomes[i] = (result, None)
+    if include_confidence:
+        first = batched[0][0]
+        outcomes[first] = (
+            outcomes[first][0],
+            usage_info(", ".join(mp["name"] for _, mp in batched), usage),
+        )
+    return outcomes
+
+
 @app.post("/categorize")
 def categorize():
     # Require API key when one is configured
@@ -178,16 +307,13 @@ def categorize():
             "details": str(e)
         }), 400
 
-    # Load marketplaces config
-    marketplaces_cfg = load_marketplaces()
-    all_mps = marketplaces_cfg.get("marketplaces", []) or []
+    # Load marketplaces config (cached until marketplaces.json changes)
+    all_mps, mps_by_name = load_marketplace_index()
 
     # Optional query param: ?marketplace=Name (case-insensitive)
     mp_filter = request.args.get("marketplace")
     if mp_filter:
-        target = next(
-            (m for m in all_mps if _lower(m.get("name")) == _lower(mp_filter)),
-            None)
+        target = mps_by_name.get(mp_filter.lower())
         if not target:
             return jsonify({
                 "error": "Invalid marketplace name",
@@ -226,64 +352,33 @@ def categorize():
     req_anthropic_top_p      = _float_param("ANTHROPIC_TOP_P")
     req_anthropic_max_tokens = _int_param("ANTHROPIC_MAX_TOKENS")
 
-    # For each marketplace: skip missing taxonomy file with a note; otherwise categorize
-    results = []
-    usage_list = []
-    for mp in mps:
-        name = mp["name"]
-        taxonomy_path = mp["taxonomy_file"]
-        id_field = mp.get("id_field", "id")
-        name_field = mp.get("name_field", "name")
-        children_field = mp.get("children_field", "children")
-
-        if not os.path.exists(taxonomy_path):
-            missing = MarketplaceCategoryResult(
-                marketplace=name,
-                category_name="UNMAPPED",
-                category_id="N/A",
-                category_path="N/A",
-                note=f"Skipped: taxonomy file not found at '{taxonomy_path}'")
-            results.append(missing.model_dump())
-            # Track zero usage for skipped marketplaces
-            if include_confidence:
-                usage_list.append(
-                    UsageInfo(
-                        marketplace=name,
-                        prompt_tokens=0,
-                        completion_tokens=0,
-                        total_tokens=0,
-                    ))
-            continue
-
-        taxonomy = load_taxonomy(taxonomy_path)
-        result, usage = choose_category_for_marketplace(
-            item,
-            name,
-            taxonomy,
-            id_field=id_field,
-            name_field=name_field,
-            children_field=children_field,
-            include_confidence=include_confidence,
-            provider=req_provider,
-            openai_model=req_openai_model,
-            openai_temperature=req_openai_temp,
-            openai_top_p=req_openai_top_p,
-            openai_max_tokens=req_openai_max_tokens,
-            anthropic_model=req_anthropic_model,
-            anthropic_temperature=req_anthropic_temp,
-            anthropic_top_p=req_anthropic_top_p,
-            anthropic_max_tokens=req_anthropic_max_tokens,
-        )
-        results.append(result.model_dump())
-        # Track usage per marketplace when test mode enabled
-        if include_confidence:
-            usage_list.append(
-                UsageInfo(
-                    marketplace=name,
-                    prompt_tokens=usage.get("prompt_tokens", 0),
-                    completion_tokens=usage.get("completion_tokens", 0),
-                    total_tokens=usage.get("total_tokens", 0),
-                ))
+    llm_overrides = dict(
+        provider=req_provider,
+        openai_model=req_openai_model,
+        openai_temperature=req_openai_temp,
+        openai_top_p=req_openai_top_p,
+        openai_max_tokens=req_openai_max_tokens,
+        anthropic_model=req_anthropic_model,
+        anthropic_temperature=req_anthropic_temp,
+        anthropic_top_p=req_anthropic_top_p,
+        anthropic_max_tokens=req_anthropic_max_tokens,
+    )
+
+    # Marketplaces are independent and each blocks on an LLM call, so run them concurrently.
+    # Everything request-bound is resolved above: worker threads never touch `request`.
+    def _run_one(mp):
+        return _categorize_one(item, mp, include_confidence, llm_overrides)
+
+    if _BATCH_MARKETPLACES and len(mps) > 1:
+        outcomes = _categorize_batched(item, mps, include_confidence, llm_overrides)
+    elif len(mps) > 1:
+        with ThreadPoolExecutor(max_workers=min(_MAX_MP_WORKERS, len(mps))) as ex:
+            outcomes = list(ex.map(_run_one, mps))
+    else:
+        outcomes = [_run_one(mp) for mp in mps]
+
+    results = [result for result, _ in outcomes]
+    usage_list = [usage for _, usage in outcomes if usage is not None]
 
     # Transform results to new format
     categories = []
@@ -305,7 +400,7 @@ def categorize():
 
     # Add usage array when test mode enabled
     if include_confidence and usage_list:
-        resp["usage"] = [u.model_dump() for u in usage_list]
+        resp["usage"] = usage_list
 
     # Add environment config when test mode enabled (shows effective values used)
     if include_confidence:
@@ -321,7 +416,7 @@ def categorize():
             "ANTHROPIC_MAX_TOKENS": req_anthropic_max_tokens if req_anthropic_max_tokens is not None else ANTHROPIC_MAX_TOKENS,
         }
 
-    return jsonify(resp), 200
+    return resp
 
 
 # replace your existing block at the very bottom
@@ -34,6 +34,14 @@ ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest")
 ANTHROPIC_TEMPERATURE = _get_float_env("ANTHROPIC_TEMPERATURE", 0.0)
 ANTHROPIC_TOP_P = _get_float_env("ANTHROPIC_TOP_P")
 ANTHROPIC_MAX_TOKENS = _get_int_env("ANTHROPIC_MAX_TOKENS", 300)
+# Max in-flight requests per provider from one worker process
+OPENAI_MAX_CONCURRENCY = max(1, _get_int_env("OPENAI_MAX_CONCURRENCY", 10))
+ANTHROPIC_MAX_CONCURRENCY = max(1, _get_int_env("ANTHROPIC_MAX_CONCURRENCY", 5))
+# Retries on 429 / 5xx / connection errors, with the SDKs' exponential backoff
+LLM_MAX_RETRIES = max(0, _get_int_env("LLM_MAX_RETRIES", 2))
+# In-process cache of temperature-0 completions (entries per worker; 0 disables)
+LLM_CACHE_SIZE = _get_int_env("LLM_CACHE_SIZE", 2048)
+LLM_CACHE_TTL = _get_float_env("LLM_CACHE_TTL", 30 * 24 * 3600)
 
 API_KEY = os.getenv("API_KEY")
 
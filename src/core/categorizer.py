@@ -1,12 +1,15 @@
 # src/core/categorizer.py
-from typing import Dict, Any, List, Tuple
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, List, Optional, Set, Tuple
 import os
 import re
 
-from .models import ItemInput, MarketplaceCategoryResult
+import numpy as np
+
+from .models import ItemInput, category_result
 from .loaders import load_prompt
 from .taxonomy_store import flatten_to_leaves
-from .llm import pick_category_via_llm
+from .llm import pick_category_via_llm, pick_categories_via_llm
 
 # --- config (tunable without redeploy) ---
 _SHORTLIST_MAX = int(os.getenv("SHORTLIST_MAX_PER_MKT", "300"))
@@ -14,51 +17,183 @@ _MAX_NAME_CHARS = int(os.getenv("MAX_NAME_CHARS", "300"))
 _MAX_DESC_CHARS = int(os.getenv("MAX_DESC_CHARS", "2000"))
 _DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
 
+_PATH_PREFIX_RULE = "Candidate paths are relative to the marketplace's path_prefix, which all of them share."
+
 # --- simple heuristic scoring for pre-filtering ---
-_WORD = re.compile(r"[A-Za-z0-9]+")
+# Alphanumeric runs of 3+ chars; the length rule lives in the pattern
+_WORD = re.compile(r"[A-Za-z0-9]{3,}")
+
+def _keywords(text: str) -> Set[str]:
+    return {m.group(0).lower() for m in _WORD.finditer(text or "")}
+
+@lru_cache(maxsize=2048)
+def _query_keywords(name: str, description: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    # The same item is prefiltered once per marketplace; tokenize its text only once
+    return frozenset(_keywords(name)), frozenset(_keywords(description))
+
+class _LeafIndex:
+    """
+    Inverted index (token -> sorted leaf indices) for one leaf list. A request only
+    touches the posting lists of its own tokens, i.e. the leaves that can score at all.
+    Scores are kept as integers scaled by 10 (2 per name hit, 1 per description hit,
+    0.1 per depth level) so ties compare exactly.
+    """
+    __slots__ = ("leaves", "ids", "names", "paths", "depths", "entries", "postings")
+
+    def __init__(self, leaves: List[Dict[str, Any]]):
+        self.leaves = leaves
+        # Column (struct-of-arrays) view of the leaves, read out of the dicts once;
+        # everything below is derived from these rather than from per-leaf lookups
+        self.ids = tuple(str(leaf["id"]) for leaf in leaves)
+        self.names = tuple(str(leaf["name"]) for leaf in leaves)
+        self.paths = tuple(str(leaf["path"]) for leaf in leaves)
+        self.depths = np.fromiter((int(leaf.get("depth", 0)) for leaf in leaves), dtype=np.int32, count=len(leaves))
+
+        postings: Dict[str, List[int]] = {}
+        for i, (path, name) in enumerate(zip(self.paths, self.names)):
+            for w in _keywords(path + " " + name):
+                postings.setdefault(w, []).append(i)
+        self.postings = {w: np.array(ids, dtype=np.intp) for w, ids in postings.items()}
+        # Candidate entries exactly as sent to the LLM, built once rather than per request.
+        # Shared between requests: treat as read-only.
+        self.entries = [
+            {"id": _id, "name": name, "path": path, "depth": depth}
+            for _id, name, path, depth in zip(self.ids, self.names, self.paths, self.depths.tolist())
+        ]
+
+    def scores(self, name_kw: FrozenSet[str], desc_kw: FrozenSet[str]) -> np.ndarray:
+        # Untouched leaves keep their depth bonus, which still orders the tail of the shortlist
+        scores = self.depths.astype(np.int64)
+        n = len(self.leaves)
+        for words, weight in ((name_kw, 20), (desc_kw, 10)):
+            hits = [self.postings[w] for w in words if w in self.postings]
+            if hits:
+                # One bincount per group counts every matched token per leaf in a single C pass
+                scores += weight * np.bincount(np.concatenate(hits), minlength=n)
+        return scores
+
+
+# Keyed by id(leaves); the stored list is compared by identity before reuse
+_INDEX_CACHE: Dict[int, _LeafIndex] = {}
+_INDEX_CACHE_MAX = 32
 
-def _keywords(text: str) -> List[str]:
-    return [w.lower() for w in _WORD.findall(text or "") if len(w) > 2]
+def _leaf_index(leaves: List[Dict[str, Any]]) -> _LeafIndex:
+    index = _INDEX_CACHE.get(id(leaves))
+    if index is None or index.leaves is not leaves:
+        index = _LeafIndex(leaves)
+        if len(_INDEX_CACHE) >= _INDEX_CACHE_MAX:
+            _INDEX_CACHE.clear()
+        _INDEX_CACHE[id(leaves)] = index
+    return index
 
-def _score_leaf(product_name: str, product_desc: str, leaf: Dict[str, Any]) -> float:
-    name_kw = set(_keywords(product_name))
-    desc_kw = set(_keywords(product_desc))
-    path = (leaf.get("path") or "") + " " + (leaf.get("name") or "")
-    leaf_kw = set(_keywords(path))
-    # Weighted overlap: name words weigh more than description; slight depth bonus
-    return 2.0 * len(name_kw & leaf_kw) + 1.0 * len(desc_kw & leaf_kw) + 0.1 * float(leaf.get("depth", 0))
+def prepare_leaves(leaves: List[Dict[str, Any]]) -> None:
+    """Build the prefilter index for a (cached) leaf list ahead of the first request."""
+    if leaves:
+        _leaf_index(leaves)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, earliest index winning ties (like a stable sort)."""
+    n = scores.shape[0]
+    k = min(k, n)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+        kth = scores[idx].min()
+        # argpartition splits ties at the boundary arbitrarily; keep the earliest leaves instead
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: k - above.size]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))]
 
 def _prefilter_candidates(item: ItemInput, leaves: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
-    scored: List[Tuple[float, Dict[str, Any]]] = []
-    # Truncate to keep tokens in check
-    name = (item.name or "")[:_MAX_NAME_CHARS]
-    desc = (item.description or "")[:_MAX_DESC_CHARS]
-    for leaf in leaves:
-        scored.append((_score_leaf(name, desc, leaf), leaf))
-    scored.sort(key=lambda t: t[0], reverse=True)
-    return [leaf for _, leaf in scored[:max(1, top_k)]]
-
-def _index_candidates(cands: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
-    by_id = {str(c["id"]): c for c in cands if "id" in c}
-    by_name = {}
-    for c in cands:
-        nm = str(c.get("name", "")).strip().lower()
-        by_name.setdefault(nm, []).append(c)
-    return by_id, by_name
+    if not leaves:
+        return []
+    index = _leaf_index(leaves)
+    # Truncate to keep tokens in check (and the cache keys bounded)
+    name_kw, desc_kw = _query_keywords((item.name or "")[:_MAX_NAME_CHARS], (item.description or "")[:_MAX_DESC_CHARS])
+    idx = _top_k(index.scores(name_kw, desc_kw), max(1, top_k))
+    return [index.entries[i] for i in idx.tolist()]
+
+def _compact_candidates(candidates: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Shrink the candidate list sent to the LLM: drop repeated ids (the first, best-scored
+    entry is the one _resolve_choice would use anyway) and factor out the leading path
+    segments every candidate shares, e.g. a synthetic taxonomy root. Returns
+    (shared_prefix, candidates); the prefix is "" when nothing is shared.
+    """
+    seen: Set[str] = set()
+    unique = []
+    for cand in candidates:
+        if cand["id"] not in seen:
+            seen.add(cand["id"])
+            unique.append(cand)
+    # a prefix that ends on a " > " in the common string ends on a segment boundary in every path
+    common = os.path.commonprefix([cand["path"] for cand in unique])
+    cut = common.rfind(" > ")
+    if cut <= 0:
+        return "", unique
+    skip = cut + 3
+    return common[:cut], [
+        {"id": cand["id"], "name": cand["name"], "path": cand["path"][skip:], "depth": cand["depth"]}
+        for cand in unique
+    ]
 
 def _truncate(text: str, limit: int) -> str:
     if not text:
         return text
     return text if len(text) <= limit else text[:limit]
 
+def _unmapped(marketplace_name: str) -> Dict[str, Any]:
+    return category_result(marketplace_name, "UNMAPPED", "N/A", "N/A")
+
+def _product_block(item: ItemInput) -> Dict[str, Any]:
+    return {
+        "sku": item.sku,
+        "name": _truncate(item.name or "", _MAX_NAME_CHARS),
+        "brand": item.brand,
+        "description": _truncate(item.description or "", _MAX_DESC_CHARS),
+        "image_url": item.image_url,
+        "attributes": item.attributes,
+    }
+
+def _resolve_choice(
+    item: ItemInput,
+    marketplace_name: str,
+    candidates: List[Dict[str, Any]],
+    cat_id: Optional[str],
+    cat_name: Optional[str],
+    confidence: Optional[float],
+    include_confidence: bool,
+) -> Dict[str, Any]:
+    """Map the LLM's pick back onto a candidate (by id, then by name), else the top-scoring candidate."""
+    if cat_id and cat_name:
+        cat_id = str(cat_id)
+        cand = next((c for c in candidates if c["id"] == cat_id), None)
+        if cand:
+            return category_result(marketplace_name, cand["name"], cand["id"], cand["path"], confidence)
+        # Only scanned when the id missed: first candidate whose name matches
+        nm = str(cat_name).strip().lower()
+        chosen = next((c for c in candidates if c["name"].strip().lower() == nm), None)
+        if chosen:
+            return category_result(marketplace_name, chosen["name"], chosen["id"], chosen["path"], confidence)
+
+    # Fallback: top-scoring candidate
+    best = candidates[0]
+    if _DEBUG:
+        print(f"[DEBUG] Fallback used for {item.sku} @ {marketplace_name}; candidates={len(candidates)}")
+    return category_result(
+        marketplace_name, best["name"], best["id"], best["path"], confidence if include_confidence else None
+    )
+
 # --- main entry used by the API ---
-# ... existing imports & helpers ...
 
 def choose_category_for_marketplace(
     item: ItemInput,
     marketplace_name: str,
-    taxonomy: Dict[str, Any],
+    taxonomy: Optional[Dict[str, Any]] = None,
     *,
+    leaves: Optional[List[Dict[str, Any]]] = None,
     id_field: str = "id",
     name_field: str = "name",
     children_field: str = "children",
@@ -72,51 +207,31 @@ def choose_category_for_marketplace(
     anthropic_temperature: float = None,
     anthropic_top_p: float = None,
     anthropic_max_tokens: int = None,
-) -> Tuple[MarketplaceCategoryResult, Dict[str, int]]:
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
     system_prompt = load_prompt()
 
     zero_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-    
-    leaves = flatten_to_leaves(taxonomy, id_field=id_field, name_field=name_field, children_field=children_field)
+
+    # Callers holding cached leaves (see loaders.load_taxonomy_leaves) skip the flatten entirely
+    if leaves is None:
+        leaves = flatten_to_leaves(taxonomy or {}, id_field=id_field, name_field=name_field, children_field=children_field)
     if not leaves:
-        return MarketplaceCategoryResult(
-            marketplace=marketplace_name,
-            category_name="UNMAPPED",
-            category_id="N/A",
-            category_path="N/A",
-        ), zero_usage
+        return _unmapped(marketplace_name), zero_usage
 
     candidates = _prefilter_candidates(item, leaves, top_k=_SHORTLIST_MAX)
     if not candidates:
-        return MarketplaceCategoryResult(
-            marketplace=marketplace_name,
-            category_name="UNMAPPED",
-            category_id="N/A",
-            category_path="N/A",
-        ), zero_usage
-
-    safe_name = _truncate(item.name or "", _MAX_NAME_CHARS)
-    safe_desc = _truncate(item.description or "", _MAX_DESC_CHARS)
+        return _unmapped(marketplace_name), zero_usage
 
+    path_prefix, compact = _compact_candidates(candidates)
     payload = {
-        "product": {
-            "sku": item.sku,
-            "name": safe_name,
-            "brand": item.brand,
-            "description": safe_desc,
-            "image_url": item.image_url,
-            "attributes": item.attributes,
-        },
+        "product": _product_block(item),
         "marketplace": {
             "name": marketplace_name,
             "id_field": id_field,
             "name_field": name_field,
             "children_field": children_field,
         },
-        "candidates": [
-            {"id": str(c["id"]), "name": str(c["name"]), "path": str(c["path"]), "depth": int(c["depth"])}
-            for c in candidates
-        ],
+        "candidates": compact,
         "output_format": {"category_id": "string", "category_name": "string"},
         "rules": [
             "Select exactly one leaf from candidates.",
@@ -130,6 +245,9 @@ def choose_category_for_marketplace(
         payload["output_format"]["confidence"] = "number between 0 and 1"
         payload["rules"].append("Return a confidence score between 0 and 1 indicating certainty.")
         payload["rules"][-2] = "Return ONLY JSON with keys: category_id, category_name, confidence."
+    if path_prefix:
+        payload["marketplace"]["path_prefix"] = path_prefix
+        payload["rules"].insert(0, _PATH_PREFIX_RULE)
 
     cat_id, cat_name, confidence, _raw, usage = pick_category_via_llm(
         system_prompt,
@@ -146,37 +264,94 @@ def choose_category_for_marketplace(
         anthropic_max_tokens=anthropic_max_tokens,
     )
 
-    by_id, by_name = _index_candidates(payload["candidates"])
-    if cat_id and cat_name:
-        cand = by_id.get(str(cat_id))
-        if cand:
-            return MarketplaceCategoryResult(
-                marketplace=marketplace_name,
-                category_name=str(cand["name"]),
-                category_id=str(cand["id"]),
-                category_path=str(cand["path"]),
-                confidence=confidence,
-            ), usage
-        nm = str(cat_name).strip().lower()
-        name_matches = by_name.get(nm, [])
-        if name_matches:
-            chosen = name_matches[0]
-            return MarketplaceCategoryResult(
-                marketplace=marketplace_name,
-                category_name=str(chosen["name"]),
-                category_id=str(chosen["id"]),
-                category_path=str(chosen["path"]),
-                confidence=confidence,
-            ), usage
-
-    # Fallback: top-scoring candidate
-    best = candidates[0]
-    if _DEBUG:
-        print(f"[DEBUG] Fallback used for {item.sku} @ {marketplace_name}; candidates={len(candidates)}")
-    return MarketplaceCategoryResult(
-        marketplace=marketplace_name,
-        category_name=str(best["name"]),
-        category_id=str(best["id"]),
-        category_path=str(best["path"]),
-        confidence=confidence if include_confidence else None,
+    return _resolve_choice(
+        item, marketplace_name, candidates, cat_id, cat_name, confidence, include_confidence
     ), usage
+
+
+def choose_categories_for_marketplaces(
+    item: ItemInput,
+    marketplaces: List[Dict[str, Any]],
+    *,
+    include_confidence: bool = False,
+    provider: str = None,
+    openai_model: str = None,
+    openai_temperature: float = None,
+    openai_top_p: float = None,
+    openai_max_tokens: int = None,
+    anthropic_model: str = None,
+    anthropic_temperature: float = None,
+    anthropic_top_p: float = None,
+    anthropic_max_tokens: int = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Batched variant of choose_category_for_marketplace: one LLM call covers every marketplace,
+    so the system prompt and product block are sent (and billed) once.
+    Each marketplaces entry: {"name", "leaves", "id_field", "name_field", "children_field"}.
+    Returns results in input order plus the usage of the single call.
+    """
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    results: List[Optional[Dict[str, Any]]] = [None] * len(marketplaces)
+    shortlisted = []  # (index, name, candidates)
+    for i, mp in enumerate(marketplaces):
+        candidates = _prefilter_candidates(item, mp.get("leaves") or [], top_k=_SHORTLIST_MAX)
+        if candidates:
+            shortlisted.append((i, mp["name"], candidates))
+        else:
+            results[i] = _unmapped(mp["name"])
+    if not shortlisted:
+        return results, usage
+
+    output_entry = {"marketplace": "string", "category_id": "string", "category_name": "string"}
+    if include_confidence:
+        output_entry["confidence"] = "number between 0 and 1"
+    keys = ", ".join(output_entry)
+    blocks = []
+    for i, name, candidates in shortlisted:
+        path_prefix, compact = _compact_candidates(candidates)
+        block = {
+            "name": name,
+            "id_field": marketplaces[i].get("id_field", "id"),
+            "name_field": marketplaces[i].get("name_field", "name"),
+            "children_field": marketplaces[i].get("children_field", "children"),
+            "candidates": compact,
+        }
+        if path_prefix:
+            block["path_prefix"] = path_prefix
+        blocks.append(block)
+    payload = {
+        "product": _product_block(item),
+        "marketplaces": blocks,
+        "output_format": {"categories": [output_entry]},
+        "rules": [
+            "For each marketplace, select exactly one leaf from that marketplace's candidates.",
+            "Prefer deeper, more specific leaves.",
+            "Match product name first, then description, to leaf path/name.",
+            "If ties remain, pick the earliest candidate in the list.",
+            f"Return ONLY JSON with key categories: one entry per marketplace with keys: {keys}.",
+        ],
+    }
+    if any("path_prefix" in block for block in blocks):
+        payload["rules"].insert(0, _PATH_PREFIX_RULE)
+
+    picks, _raw, usage = pick_categories_via_llm(
+        load_prompt(),
+        payload,
+        include_confidence=include_confidence,
+        provider=provider,
+        openai_model=openai_model,
+        openai_temperature=openai_temperature,
+        openai_top_p=openai_top_p,
+        openai_max_tokens=openai_max_tokens,
+        anthropic_model=anthropic_model,
+        anthropic_temperature=anthropic_temperature,
+        anthropic_top_p=anthropic_top_p,
+        anthropic_max_tokens=anthropic_max_tokens,
+    )
+
+    for i, name, candidates in shortlisted:
+        cat_id, cat_name, confidence = picks.get(name.strip().lower(), (None, None, None))
+        results[i] = _resolve_choice(
+            item, name, candidates, cat_id, cat_name, confidence, include_confidence
+        )
+    return results, usage
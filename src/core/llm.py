@@ -4,6 +4,8 @@ LLM adapter for per-marketplace category selection.
 Public API:
     pick_category_via_llm(system_prompt: str, payload: Dict[str, Any], *, include_confidence: bool = False)
         -> Tuple[Optional[str], Optional[str], Optional[float], str, Dict[str, int]]
+    pick_categories_via_llm(system_prompt: str, payload: Dict[str, Any], *, include_confidence: bool = False)
+        -> Tuple[Dict[str, Tuple[str, str, Optional[float]]], str, Dict[str, int]]
 
 Behavior:
 - Sends your system prompt + a compact JSON payload describing the product
@@ -17,29 +19,16 @@ Behavior:
 
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, Tuple, Optional
-
-
-def _extract_usage(usage_obj: Any) -> Dict[str, int]:
-    """Extract token usage from API response, return zeros if unavailable"""
-    try:
-        # OpenAI style
-        if hasattr(usage_obj, "prompt_tokens") and hasattr(usage_obj, "completion_tokens"):
-            prompt = int(usage_obj.prompt_tokens or 0)
-            completion = int(usage_obj.completion_tokens or 0)
-            total = int(getattr(usage_obj, "total_tokens", prompt + completion))
-            return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": total}
-        # Anthropic style
-        if hasattr(usage_obj, "input_tokens") and hasattr(usage_obj, "output_tokens"):
-            prompt = int(usage_obj.input_tokens or 0)
-            completion = int(usage_obj.output_tokens or 0)
-            return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
-    except Exception:
-        pass
-    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Optional
 
+import httpx
+import orjson
 
+from . import llm_cache
 from ..config import (
     MODEL_PROVIDER,
     OPENAI_API_KEY,
@@ -52,36 +41,46 @@ from ..config import (
     ANTHROPIC_TEMPERATURE,
     ANTHROPIC_TOP_P,
     ANTHROPIC_MAX_TOKENS,
+    OPENAI_MAX_CONCURRENCY,
+    ANTHROPIC_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
 )
 
+_log = logging.getLogger(__name__)
+
 # ------------------------- parsing helpers ------------------------- #
 
 
+# ```lang\n ... ``` around the whole reply
+_FENCE_RE = re.compile(r"^```[A-Za-z0-9_-]*\n(.*?)\n?`{3,}$", re.DOTALL)
+
+
 def _strip_code_fences(text: str) -> str:
     text = (text or "").strip()
-    if text.startswith("```"):
-        # remove surrounding backticks and drop an optional language tag
-        text = text.strip("`")
-        first_newline = text.find("\n")
-        if first_newline != -1:
-            text = text[first_newline + 1 :]
+    if not text.startswith("```"):
+        return text
+    m = _FENCE_RE.match(text)
+    if m:
+        return m.group(1).strip()
+    # irregular fence: remove surrounding backticks and drop an optional language tag
+    text = text.strip("`")
+    first_newline = text.find("\n")
+    if first_newline != -1:
+        text = text[first_newline + 1 :]
     return text.strip()
 
 
 def _try_parse_json(text: str) -> Optional[Dict[str, Any]]:
     text = _strip_code_fences(text)
+    # Parse the outermost {...} span once; for a clean reply that is the whole text,
+    # and any prose around the object is skipped without a failed first attempt.
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        return None
     try:
-        return json.loads(text)
-    except Exception:
-        # last ditch: try to find a top-level JSON object within text
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            frag = text[start : end + 1]
-            try:
-                return json.loads(frag)
-            except Exception:
-                pass
+        return orjson.loads(text if start == 0 and end == len(text) - 1 else text[start : end + 1])
+    except orjson.JSONDecodeError:
         return None
 
 
@@ -143,67 +142,235 @@ def _extract_category(
     return None, None, None
 
 
+def _extract_usage(usage_obj: Any) -> Dict[str, int]:
+    """Extract token usage from API response, return zeros if unavailable"""
+    try:
+        # OpenAI style
+        if hasattr(usage_obj, "prompt_tokens") and hasattr(usage_obj, "completion_tokens"):
+            prompt = int(usage_obj.prompt_tokens or 0)
+            completion = int(usage_obj.completion_tokens or 0)
+            total = int(getattr(usage_obj, "total_tokens", prompt + completion))
+            return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": total}
+        # Anthropic style
+        if hasattr(usage_obj, "input_tokens") and hasattr(usage_obj, "output_tokens"):
+            # input_tokens excludes prompt-cache reads/writes; count them as prompt tokens too
+            prompt = (
+                int(usage_obj.input_tokens or 0)
+                + int(getattr(usage_obj, "cache_creation_input_tokens", 0) or 0)
+                + int(getattr(usage_obj, "cache_read_input_tokens", 0) or 0)
+            )
+            completion = int(usage_obj.output_tokens or 0)
+            return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+    except Exception:
+        pass
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
 # ------------------------- providers ------------------------- #
 
+# One client (and so one pooled, keep-alive connection set) per API key for the life
+# of the process; building a client per call paid a fresh TCP+TLS handshake each time.
+# SDK clients are thread-safe, so the marketplace worker threads share them.
 
-def choose_with_openai(
+# Marketplaces already run on a thread pool (see api.main); these cap how many of
+# those threads, across all concurrent requests, hit each provider at once. A call
+# keeps its slot while the SDK backs off and retries, so a throttled provider also
+# sees fewer new requests until it recovers.
+_OPENAI_SLOTS = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+_ANTHROPIC_SLOTS = threading.BoundedSemaphore(ANTHROPIC_MAX_CONCURRENCY)
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: Optional[str]):
+    from openai import OpenAI, DefaultHttpxClient
+
+    return OpenAI(
+        api_key=api_key,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=180)
+        ),
+    )
+
+
+@lru_cache(maxsize=4)
+def _anthropic_client(api_key: Optional[str]):
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    return Anthropic(
+        api_key=api_key,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+        ),
+    )
+
+
+def _openai_complete(
     system_prompt: str,
-    payload: Dict[str, Any],
+    user_content: str,
     *,
-    include_confidence: bool = False,
     model: str = None,
     temperature: float = None,
     top_p: float = None,
     max_tokens: int = None,
-) -> Tuple[Optional[str], Optional[str], Optional[float], str, Dict[str, int]]:
-    """
-    Call OpenAI Chat Completions with JSON-only response mode where supported.
-    Returns (category_id, category_name, confidence, raw_text, usage_dict).
-    """
-    from openai import OpenAI
-
-    client = OpenAI(api_key=OPENAI_API_KEY)
+) -> Tuple[str, Dict[str, int]]:
+    """Single JSON-mode chat completion. Returns (raw_text, usage_dict)."""
+    client = _openai_client(OPENAI_API_KEY)
 
     _model = model if model is not None else OPENAI_MODEL
     _temperature = temperature if temperature is not None else OPENAI_TEMPERATURE
     _top_p = top_p if top_p is not None else OPENAI_TOP_P
     _max_tokens = max_tokens if max_tokens is not None else OPENAI_MAX_TOKENS
 
-    if include_confidence:
-        user_instructions = (
-            "You MUST return ONLY a single JSON object with exactly these keys:\n"
-            '  - "category_id": string\n'
-            '  - "category_name": string\n'
-            '  - "confidence": number between 0 and 1\n'
-            "No markdown, no extra fields, no explanations.\n"
+    cache_key = None
+    if not _temperature:
+        cache_key = llm_cache.make_key("openai", _model, _top_p, _max_tokens, system_prompt, user_content)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached, _extract_usage(None)
+
+    with _OPENAI_SLOTS:
+        completion = client.chat.completions.create(
+            model=_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content},
+            ],
+            response_format={"type": "json_object"},
+            temperature=_temperature,
+            top_p=_top_p,
+            max_completion_tokens=_max_tokens,
         )
-    else:
-        user_instructions = (
-            "You MUST return ONLY a single JSON object with exactly these keys:\n"
-            '  - "category_id": string\n'
-            '  - "category_name": string\n'
-            "No markdown, no extra fields, no explanations.\n"
+
+    content = completion.choices[0].message.content or ""
+    if cache_key:
+        llm_cache.put(cache_key, content)
+    return content, _extract_usage(completion.usage)
+
+
+def _anthropic_complete(
+    system_prompt: str,
+    user_blocks: List[str],
+    *,
+    model: str = None,
+    temperature: float = None,
+    max_tokens: int = None,
+) -> Tuple[str, Dict[str, int]]:
+    """Single Messages API call; text blocks of the reply are joined. Returns (raw_text, usage_dict)."""
+    client = _anthropic_client(ANTHROPIC_API_KEY)
+
+    _model = model if model is not None else ANTHROPIC_MODEL
+    _temperature = temperature if temperature is not None else ANTHROPIC_TEMPERATURE
+    # _top_p = top_p if top_p is not None else ANTHROPIC_TOP_P
+    _max_tokens = max_tokens if max_tokens is not None else ANTHROPIC_MAX_TOKENS
+
+    anthropic_params = {
+        "temperature": _temperature,
+        "max_tokens": _max_tokens,
+    }
+    # if _top_p is not None:
+    # anthropic_params["top_p"] = _top_p
+
+    cache_key = None
+    if not _temperature:
+        cache_key = llm_cache.make_key("anthropic", _model, _max_tokens, system_prompt, user_blocks)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached, _extract_usage(None)
+
+    with _ANTHROPIC_SLOTS:
+        msg = client.messages.create(
+            model=_model,
+            # The system prompt is the same for every call, so mark it as a cacheable
+            # prefix; candidates differ per item and stay in the user turn after it.
+            system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+            messages=[
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": block} for block in user_blocks],
+                }
+            ],
+            **anthropic_params,
         )
 
-    completion = client.chat.completions.create(
-        model=_model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": user_instructions
-                + "\n\n"
-                + json.dumps(payload, ensure_ascii=False),
-            },
-        ],
-        response_format={"type": "json_object"},
-        temperature=_temperature,
-        top_p=_top_p,
-        max_completion_tokens=_max_tokens,
+    # Concatenate text blocks; replies are almost always a single one
+    parts = msg.content
+    if len(parts) == 1 and getattr(parts[0], "type", None) == "text":
+        content = parts[0].text.strip()
+    else:
+        content = "\n".join(p.text for p in parts if getattr(p, "type", None) == "text").strip()
+    if cache_key:
+        llm_cache.put(cache_key, content)
+
+    return content, _extract_usage(msg.usage)
+
+
+# Fixed response-format instructions sent ahead of the JSON payload; built once here
+# rather than on every call. The OpenAI variants carry the blank-line separator.
+_OPENAI_INSTRUCTIONS = (
+    "You MUST return ONLY a single JSON object with exactly these keys:\n"
+    '  - "category_id": string\n'
+    '  - "category_name": string\n'
+    "No markdown, no extra fields, no explanations.\n"
+    "\n\n"
+)
+_OPENAI_INSTRUCTIONS_CONF = (
+    "You MUST return ONLY a single JSON object with exactly these keys:\n"
+    '  - "category_id": string\n'
+    '  - "category_name": string\n'
+    '  - "confidence": number between 0 and 1\n'
+    "No markdown, no extra fields, no explanations.\n"
+    "\n\n"
+)
+_ANTHROPIC_INSTRUCTIONS = (
+    "Return ONLY a JSON object with exactly:\n"
+    '{"category_id": "...", "category_name": "..."}\n'
+    "No prose, no markdown."
+)
+_ANTHROPIC_INSTRUCTIONS_CONF = (
+    "Return ONLY a JSON object with exactly:\n"
+    '{"category_id": "...", "category_name": "...", "confidence": number between 0 and 1}\n'
+    "No prose, no markdown."
+)
+_BATCH_INSTRUCTIONS = (
+    "Return ONLY a JSON object of the form:\n"
+    '{"categories": [{"marketplace": "...", "category_id": "...", "category_name": "..."}]}\n'
+    "with exactly one entry per marketplace in the input. No prose, no markdown."
+)
+_BATCH_INSTRUCTIONS_CONF = (
+    "Return ONLY a JSON object of the form:\n"
+    '{"categories": [{"marketplace": "...", "category_id": "...", "category_name": "...", '
+    '"confidence": number between 0 and 1}]}\n'
+    "with exactly one entry per marketplace in the input. No prose, no markdown."
+)
+
+
+def choose_with_openai(
+    system_prompt: str,
+    payload: Dict[str, Any],
+    *,
+    include_confidence: bool = False,
+    model: str = None,
+    temperature: float = None,
+    top_p: float = None,
+    max_tokens: int = None,
+) -> Tuple[Optional[str], Optional[str], Optional[float], str, Dict[str, int]]:
+    """
+    Call OpenAI Chat Completions with JSON-only response mode where supported.
+    Returns (category_id, category_name, confidence, raw_text, usage_dict).
+    """
+    user_prefix = _OPENAI_INSTRUCTIONS_CONF if include_confidence else _OPENAI_INSTRUCTIONS
+
+    content, usage = _openai_complete(
+        system_prompt,
+        user_prefix + orjson.dumps(payload).decode(),
+        model=model,
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
     )
 
-    content = completion.choices[0].message.content or ""
-    usage = _extract_usage(completion.usage)
     parsed = _try_parse_json(content)
     cat_id, cat_name, confidence = _extract_category(parsed or {})
     if cat_id and cat_name:
@@ -226,58 +393,16 @@ def choose_with_anthropic(
     so we include strong instructions and then parse.
     Returns (category_id, category_name, confidence, raw_text, usage_dict).
     """
-    from anthropic import Anthropic
-
-    client = Anthropic(api_key=ANTHROPIC_API_KEY)
-
-    _model = model if model is not None else ANTHROPIC_MODEL
-    _temperature = temperature if temperature is not None else ANTHROPIC_TEMPERATURE
-    # _top_p = top_p if top_p is not None else ANTHROPIC_TOP_P
-    _max_tokens = max_tokens if max_tokens is not None else ANTHROPIC_MAX_TOKENS
-
-    if include_confidence:
-        user_instructions = (
-            "Return ONLY a JSON object with exactly:\n"
-            '{"category_id": "...", "category_name": "...", "confidence": number between 0 and 1}\n'
-            "No prose, no markdown."
-        )
-    else:
-        user_instructions = (
-            "Return ONLY a JSON object with exactly:\n"
-            '{"category_id": "...", "category_name": "..."}\n'
-            "No prose, no markdown."
-        )
-
-    anthropic_params = {
-        "temperature": _temperature,
-        "max_tokens": _max_tokens,
-    }
-    # if _top_p is not None:
-    # anthropic_params["top_p"] = _top_p
-
-    msg = client.messages.create(
-        model=_model,
-        system=system_prompt,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_instructions},
-                    {"type": "text", "text": json.dumps(payload, ensure_ascii=False)},
-                ],
-            }
-        ],
-        **anthropic_params,
+    user_instructions = _ANTHROPIC_INSTRUCTIONS_CONF if include_confidence else _ANTHROPIC_INSTRUCTIONS
+
+    content, usage = _anthropic_complete(
+        system_prompt,
+        [user_instructions, orjson.dumps(payload).decode()],
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
     )
 
-    # Concatenate text blocks
-    content_parts = []
-    for part in msg.content:
-        if getattr(part, "type", None) == "text":
-            content_parts.append(part.text)
-    content = "\n".join(content_parts).strip()
-
-    usage = _extract_usage(msg.usage)
     parsed = _try_parse_json(content)
     cat_id, cat_name, confidence = _extract_category(parsed or {})
     if cat_id and cat_name:
@@ -314,8 +439,7 @@ def pick_category_via_llm(
     _provider = (provider or MODEL_PROVIDER).lower()
 
     if _provider == "openai" and OPENAI_API_KEY:
-        _model = openai_model or OPENAI_MODEL
-        print("[LLM] Using OpenAI:", _model)
+        _log.debug("using openai model=%s", openai_model or OPENAI_MODEL)
         return choose_with_openai(
             system_prompt,
             payload,
@@ -327,8 +451,7 @@ def pick_category_via_llm(
         )
 
     if _provider == "anthropic" and ANTHROPIC_API_KEY:
-        _model = anthropic_model or ANTHROPIC_MODEL
-        print("[LLM] Using Anthropic:", _model)
+        _log.debug("using anthropic model=%s", anthropic_model or ANTHROPIC_MODEL)
         return choose_with_anthropic(
             system_prompt,
             payload,
@@ -347,3 +470,67 @@ def pick_category_via_llm(
         "",
         {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
     )
+
+
+def pick_categories_via_llm(
+    system_prompt: str,
+    payload: Dict[str, Any],
+    *,
+    include_confidence: bool = False,
+    provider: str = None,
+    openai_model: str = None,
+    openai_temperature: float = None,
+    openai_top_p: float = None,
+    openai_max_tokens: int = None,
+    anthropic_model: str = None,
+    anthropic_temperature: float = None,
+    anthropic_top_p: float = None,
+    anthropic_max_tokens: int = None,
+) -> Tuple[Dict[str, Tuple[str, str, Optional[float]]], str, Dict[str, int]]:
+    """
+    Multi-marketplace variant of pick_category_via_llm: payload["marketplaces"] holds one
+    candidate block per marketplace and a single call classifies them all.
+    Returns ({marketplace_name_lower: (category_id, category_name, confidence)}, raw_text, usage_dict).
+    Marketplaces the model skipped or answered unparseably are simply absent from the mapping.
+    The max token budget is scaled by the number of marketplaces.
+    """
+    _provider = (provider or MODEL_PROVIDER).lower()
+    n = max(1, len(payload.get("marketplaces") or []))
+    user_instructions = _BATCH_INSTRUCTIONS_CONF if include_confidence else _BATCH_INSTRUCTIONS
+    body = orjson.dumps(payload).decode()
+
+    if _provider == "openai" and OPENAI_API_KEY:
+        _log.debug("using openai model=%s (batched)", openai_model or OPENAI_MODEL)
+        content, usage = _openai_complete(
+            system_prompt,
+            user_instructions + "\n\n" + body,
+            model=openai_model,
+            temperature=openai_temperature,
+            top_p=openai_top_p,
+            max_tokens=(openai_max_tokens or OPENAI_MAX_TOKENS) * n,
+        )
+    elif _provider == "anthropic" and ANTHROPIC_API_KEY:
+        _log.debug("using anthropic model=%s (batched)", anthropic_model or ANTHROPIC_MODEL)
+        content, usage = _anthropic_complete(
+            system_prompt,
+            [user_instructions, body],
+            model=anthropic_model,
+            temperature=anthropic_temperature,
+            max_tokens=(anthropic_max_tokens or ANTHROPIC_MAX_TOKENS) * n,
+        )
+    else:
+        # No provider/keys configured
+        return {}, "", {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    parsed = _try_parse_json(content)
+    entries = []
+    if isinstance(parsed, dict):
+        entries = parsed.get("categories") or parsed.get("results") or []
+    picks: Dict[str, Tuple[str, str, Optional[float]]] = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        cat_id, cat_name, confidence = _extract_category(entry)
+        if cat_id and cat_name:
+            picks[str(entry.get("marketplace", "")).strip().lower()] = (cat_id, cat_name, confidence)
+    return picks, content, usage
@@ -0,0 +1,50 @@
+"""
+Exact-match cache of LLM completions, in process memory.
+
+Keyed on a hash of everything that goes over the wire (provider, model, sampling
+params, system prompt, user content), so an edited prompt file or changed
+candidate list simply misses. Only deterministic (temperature 0) calls are
+cached by the callers in llm.py. Each worker process keeps its own cache.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import orjson
+
+from ..config import LLM_CACHE_SIZE, LLM_CACHE_TTL
+
+_lock = threading.Lock()
+# key -> (expires_at, completion text), least recently used first
+_entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+
+def make_key(*parts: Any) -> str:
+    return hashlib.blake2b(orjson.dumps(parts), digest_size=16).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    if LLM_CACHE_SIZE <= 0:
+        return None
+    with _lock:
+        hit = _entries.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return hit[1]
+
+
+def put(key: str, content: str) -> None:
+    if LLM_CACHE_SIZE <= 0 or not content:
+        return
+    with _lock:
+        _entries[key] = (time.monotonic() + LLM_CACHE_TTL, content)
+        _entries.move_to_end(key)
+        while len(_entries) > LLM_CACHE_SIZE:
+            _entries.popitem(last=False)
@@ -1,15 +1,65 @@
-import json
-from typing import Dict, Any
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
 from ..config import MARKETPLACES_FILE, PROMPT_FILE
+from .taxonomy_store import _read_json, flatten_to_leaves
+
+# Flattened leaves keyed by (path, mtime, id_field, name_field, children_field)
+_LEAVES_CACHE: Dict[Tuple, List[Dict[str, Any]]] = {}
 
 def load_marketplaces() -> Dict[str, Any]:
-    with open(MARKETPLACES_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _read_json(MARKETPLACES_FILE)
+
+@lru_cache(maxsize=1)
+def _marketplaces_snapshot(path: str, mtime: float) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    mps = _read_json(path).get("marketplaces", []) or []
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for mp in mps:
+        name = mp.get("name")
+        if isinstance(name, str):
+            by_name.setdefault(name.lower(), mp)  # first entry wins, as with a linear scan
+    return mps, by_name
+
+def load_marketplace_index() -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """(marketplaces, {lower-cased name: marketplace}), re-read only when the file changes. Treat as read-only."""
+    return _marketplaces_snapshot(MARKETPLACES_FILE, os.path.getmtime(MARKETPLACES_FILE))
+
+@lru_cache(maxsize=32)
+def _load_taxonomy_cached(path: str, mtime: float) -> Dict[str, Any]:
+    return _read_json(path)
 
 def load_taxonomy(path: str) -> Dict[str, Any]:
+    # mtime is part of the key, so editing a taxonomy file invalidates it automatically
+    return _load_taxonomy_cached(path, os.path.getmtime(path))
+
+def load_taxonomy_leaves(
+    path: str,
+    id_field: str = "id",
+    name_field: str = "name",
+    children_field: str = "children",
+) -> List[Dict[str, Any]]:
+    """Flattened leaves for a taxonomy file, computed once per (path, mtime). Treat as read-only."""
+    mtime = os.path.getmtime(path)
+    key = (path, mtime, id_field, name_field, children_field)
+    leaves = _LEAVES_CACHE.get(key)
+    if leaves is None:
+        # Parse directly instead of via load_taxonomy: only the leaves are kept, so the
+        # full document (label translations etc.) is freed instead of pinned in its cache
+        leaves = flatten_to_leaves(
+            _read_json(path), id_field=id_field, name_field=name_field, children_field=children_field
+        )
+        # drop entries for older versions of the same file
+        for k in [k for k in list(_LEAVES_CACHE) if k[0] == path and k[1] != mtime]:
+            _LEAVES_CACHE.pop(k, None)
+        _LEAVES_CACHE[key] = leaves
+    return leaves
+
+@lru_cache(maxsize=1)
+def _load_prompt_cached(path: str, mtime: float) -> str:
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        return f.read()
 
 def load_prompt() -> str:
-    with open(PROMPT_FILE, "r", encoding="utf-8") as f:
-        return f.read()
+    # Read once; an edited prompt file is picked up on the next call via its mtime
+    return _load_prompt_cached(PROMPT_FILE, os.path.getmtime(PROMPT_FILE))
@@ -17,6 +17,24 @@ class MarketplaceCategoryResult(BaseModel):
     confidence: Optional[float] = None # Optional confidence score from the LLM when test mode enabled
     note: Optional[str] = None         # (already added earlier)
 
+def category_result(
+    marketplace: str,
+    category_name: str,
+    category_id: str,
+    category_path: str,
+    confidence: Optional[float] = None,
+    note: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Plain-dict MarketplaceCategoryResult for the response path; built from trusted values, so no validation pass."""
+    return {
+        "marketplace": marketplace,
+        "category_name": category_name,
+        "category_id": category_id,
+        "category_path": category_path,
+        "confidence": confidence,
+        "note": note,
+    }
+
 class UsageInfo(BaseModel):
     """Token usage information per marketplace when test mode is enabled"""
     marketplace: str
@@ -24,6 +42,15 @@ class UsageInfo(BaseModel):
     completion_tokens: int = 0
     total_tokens: int = 0
 
+def usage_info(marketplace: str, usage: Dict[str, int]) -> Dict[str, Any]:
+    """Plain-dict UsageInfo for the response path"""
+    return {
+        "marketplace": marketplace,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
 class CategorizationResponse(BaseModel):
     sku: str
     categories: List[MarketplaceCategoryResult]
@@ -1,25 +1,41 @@
 # src/core/taxonomy_store.py
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any, Iterable, Tuple, Optional
-import json
+from typing import Dict, List, Any, Iterable, Sequence, Tuple, Optional
+import mmap
 import os
 import re
+import sys
 
+import numpy as np
+import orjson
 from rapidfuzz import fuzz, process
 
 # ---------------------------- utils ---------------------------- #
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_WS_RE = re.compile(r"\s+")
+# runs between common path delimiters ('/', '>', '→', '»', '|'), i.e. raw path segments
+_SEG_RE = re.compile(r"[^/|>→»]+")
+
+# Taxonomy strings and product titles repeat a lot (reloads, the same title across
+# marketplaces); both normalizers are pure, so memoize them
+@lru_cache(maxsize=65536)
 def _norm(s: str) -> str:
-    s = (s or "").lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    return re.sub(r"\s+", " ", s).strip()
+    return _WS_RE.sub(" ", _NON_ALNUM_RE.sub(" ", (s or "").lower())).strip()
+
+def _clear_norm_caches() -> None:
+    # bound memory across reloads; entries for the old taxonomies are dead weight
+    _norm.cache_clear()
+    _normalize_path.cache_clear()
 
 # ---------------------------- leaf model ---------------------------- #
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Leaf:
     id: str
     name: str
@@ -35,6 +51,34 @@ class MarketplaceTaxonomy:
     name_field: str = "name"
     children_field: str = "children"
     leaves: List[Leaf] = None      # populated after load
+    corpus: List[str] = None       # leaf tokens for fuzzy scoring, built once at load
+    leaves_view: Tuple[Dict[str, Any], ...] = ()  # get_leaves() result, built once at load
+    postings: Dict[str, np.ndarray] = None  # corpus word -> sorted leaf indices, for the token prefilter
+
+def _make_leaves(leaves_flat: Iterable[Dict[str, Any]]) -> List[Leaf]:
+    # Names repeat across a taxonomy ("Accessories", "Other", ...); interning keeps one
+    # copy of each. Paths and tokens are unique per leaf, so there is nothing to share.
+    return [
+        Leaf(
+            id=str(L["id"]),
+            name=sys.intern(str(L["name"])),
+            path=str(L["path"]),
+            depth=int(L["depth"]),
+            tokens=_norm(f'{L["path"]} {L["name"]}'),
+        )
+        for L in leaves_flat
+    ]
+
+def _index_marketplace(mt: MarketplaceTaxonomy) -> MarketplaceTaxonomy:
+    """Fill the lookup structures derived from mt.leaves (corpus, leaves_view, postings)."""
+    mt.corpus = [lf.tokens for lf in mt.leaves]
+    mt.leaves_view = tuple({"id": lf.id, "name": lf.name, "path": lf.path, "depth": lf.depth} for lf in mt.leaves)
+    postings: Dict[str, List[int]] = {}
+    for i, tokens in enumerate(mt.corpus):
+        for w in set(tokens.split()):
+            postings.setdefault(w, []).append(i)
+    mt.postings = {w: np.array(ids, dtype=np.intp) for w, ids in postings.items()}
+    return mt
 
 # ---------------------------- flatten function (kept public) ---------------------------- #
 
@@ -49,48 +93,97 @@ def flatten_to_leaves(
     If a node already includes 'path', prefer it (normalized),
     else compute from ancestor names (also normalized).
     """
-    leaves: List[Dict[str, Any]] = []
-
-    def dfs(node: Dict[str, Any], path_parts: List[str]):
+    # (id, path) -> leaf, first occurrence wins; dicts keep insertion order
+    leaves: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    # Explicit pre-order DFS; children are pushed reversed so leaves come out in
+    # document order. The ancestor path rides along already joined, so each level
+    # appends one segment instead of re-joining every ancestor name per leaf.
+    stack: List[Tuple[Dict[str, Any], str]] = [(taxonomy, "")]
+    while stack:
+        node, parent_path = stack.pop()
         name = str(node.get(name_field, ""))
-        _id = str(node.get(id_field, ""))
         children = node.get(children_field, []) or []
+        if not name:
+            path_now = parent_path
+        elif parent_path:
+            path_now = f"{parent_path} > {name}"
+        else:
+            path_now = name
 
+        if children:
+            stack.extend((c, path_now) for c in reversed(children) if isinstance(c, dict))
+            continue
+
+        _id = str(node.get(id_field, ""))
         # prefer node-provided path; else build from ancestors + current
         node_path_raw = node.get("path")
         if node_path_raw:
             path_str = _normalize_path(str(node_path_raw))
-            depth = len([p for p in path_str.split(" > ") if p])
         else:
-            path_now = path_parts + ([name] if name else [])
-            path_str = _normalize_path(" > ".join(p for p in path_now if p))
-            depth = len([p for p in path_str.split(" > ") if p])
-
-        if not children:
-            leaves.append(
-                {
-                    "id": _id,
-                    "name": name,
-                    "path": path_str,
-                    "depth": depth,
-                }
-            )
-            return
-        for c in children:
-            if isinstance(c, dict):
-                dfs(c, path_parts + ([name] if name else []))
-
-    dfs(taxonomy, [])
-
-    # Deduplicate by tuple just in case
-    seen = set()
-    unique: List[Dict[str, Any]] = []
-    for leaf in leaves:
-        k = (leaf["id"], leaf["name"], leaf["path"])
-        if k not in seen:
-            seen.add(k)
-            unique.append(leaf)
-    return unique
+            path_str = _normalize_path(path_now)
+        # _normalize_path leaves no empty segments and no '>' inside one, so counting
+        # separators is exact
+        depth = path_str.count(" > ") + 1 if path_str else 0
+
+        # Deduplicate just in case. The path ends in the leaf's own name, so id+path
+        # is enough; ids stay in the key so distinct categories sharing a path survive.
+        k = (_id, path_str)
+        if k not in leaves:
+            leaves[k] = {"id": _id, "name": name, "path": path_str, "depth": depth}
+    return list(leaves.values())
+
+
+# Files at least this big are parsed straight from a read-only mapping rather than
+# copied into a bytes object first
+_MMAP_MIN_BYTES = 64 * 1024
+
+
+def _read_json(path: Path | str) -> Any:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_BYTES:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+def _read_leaves(
+    file: Path,
+    id_field: str = "id",
+    name_field: str = "name",
+    children_field: str = "children",
+) -> List[Leaf]:
+    """
+    Parse a taxonomy file (one root object or a list of roots) into Leafs. Each root is
+    released as soon as it is flattened and the parsed document is gone before the Leaf
+    objects are built, so peak memory is not the full tree plus every leaf.
+    """
+    data = _read_json(file)
+    roots = data if isinstance(data, list) else [data]
+    del data
+    roots.reverse()
+    leaves_flat: List[Dict[str, Any]] = []
+    while roots:
+        leaves_flat.extend(
+            flatten_to_leaves(roots.pop(), id_field=id_field, name_field=name_field, children_field=children_field)
+        )
+    return _make_leaves(leaves_flat)
+
+
+def _load_one(mp: Dict[str, Any]) -> MarketplaceTaxonomy:
+    """Load one marketplaces.json entry; module-level so worker processes can run it."""
+    id_field = mp.get("id_field", "id")
+    name_field = mp.get("name_field", "name")
+    children_field = mp.get("children_field", "children")
+    file = Path(mp["taxonomy_file"])
+    return MarketplaceTaxonomy(
+        name=str(mp["name"]),
+        file=file,
+        id_field=id_field,
+        name_field=name_field,
+        children_field=children_field,
+        leaves=_read_leaves(file, id_field=id_field, name_field=name_field, children_field=children_field),
+    )
 
 
 # ---------------------------- store ---------------------------- #
@@ -123,106 +216,141 @@ class TaxonomyStore:
         """
         mps = marketplaces_cfg.get("marketplaces", []) or []
         self.marketplaces.clear()
+        _clear_norm_caches()
         for mp in mps:
-            name = str(mp["name"])
             file = Path(mp["taxonomy_file"])
-            id_field = mp.get("id_field", "id")
-            name_field = mp.get("name_field", "name")
-            children_field = mp.get("children_field", "children")
-
             if not file.exists():
-                raise FileNotFoundError(f"Taxonomy file not found for {name}: {file}")
-
-            data = json.loads(file.read_text(encoding="utf-8"))
-            roots = data if isinstance(data, list) else [data]
-            leaves_flat: List[Dict[str, Any]] = []
-            for r in roots:
-                leaves_flat.extend(
-                    flatten_to_leaves(r, id_field=id_field, name_field=name_field, children_field=children_field)
-                )
-
-            leaves: List[Leaf] = [
-                Leaf(
-                    id=str(L["id"]),
-                    name=str(L["name"]),
-                    path=str(L["path"]),
-                    depth=int(L["depth"]),
-                    tokens=_norm(f'{L["path"]} {L["name"]}'),
-                )
-                for L in leaves_flat
-            ]
-
-            self.marketplaces[name] = MarketplaceTaxonomy(
-                name=name,
-                file=file,
-                id_field=id_field,
-                name_field=name_field,
-                children_field=children_field,
-                leaves=leaves,
-            )
+                raise FileNotFoundError(f"Taxonomy file not found for {mp['name']}: {file}")
+
+        # Parsing and flattening is CPU-bound Python, so spread files over processes;
+        # for one or two files (or a single core) the pool start-up costs more than it saves
+        workers = min(len(mps), os.cpu_count() or 1)
+        if len(mps) <= 2 or workers <= 1:
+            loaded = [_load_one(mp) for mp in mps]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(_load_one, mps))
+        for mt in loaded:
+            _index_marketplace(mt)
+            self.marketplaces[mt.name] = mt
 
     # ---- Fallback: scan a directory of *.json (if you don't rely on marketplaces.json) ---- #
     def load_all_from_dir(self) -> None:
         if not self.dir:
             raise ValueError("TaxonomyStore: no taxonomy_dir was provided.")
         self.marketplaces.clear()
+        _clear_norm_caches()
         for p in sorted(self.dir.glob("*.json")):
             name = p.stem
-            data = json.loads(p.read_text(encoding="utf-8"))
-            roots = data if isinstance(data, list) else [data]
-            leaves_flat = []
-            for r in roots:
-                leaves_flat.extend(flatten_to_leaves(r))
-            leaves: List[Leaf] = [
-                Leaf(
-                    id=str(L["id"]),
-                    name=str(L["name"]),
-                    path=str(L["path"]),
-                    depth=int(L["depth"]),
-                    tokens=_norm(f'{L["path"]} {L["name"]}'),
-                )
-                for L in leaves_flat
-            ]
-            self.marketplaces[name] = MarketplaceTaxonomy(name=name, file=p, leaves=leaves)
+            leaves = _read_leaves(p)
+            self.marketplaces[name] = _index_marketplace(MarketplaceTaxonomy(name=name, file=p, leaves=leaves))
 
     # ---- Accessors ---- #
     def list_marketplaces(self) -> List[str]:
         return list(self.marketplaces.keys())
 
-    def get_leaves(self, marketplace: str) -> List[Dict[str, Any]]:
+    def get_leaves(self, marketplace: str) -> Sequence[Dict[str, Any]]:
+        """Leaves as {id, name, path, depth} dicts. Shared between callers: treat as read-only."""
         mp = self.marketplaces.get(marketplace)
         if not mp or not mp.leaves:
-            return []
-        return [
-            {"id": lf.id, "name": lf.name, "path": lf.path, "depth": lf.depth}
-            for lf in mp.leaves
-        ]
+            return ()
+        return mp.leaves_view
 
     # ---- Shortlist ---- #
-    def shortlist(self, marketplace: str, query_text: str, k: int = 50) -> List[Dict[str, Any]]:
+    def shortlist(
+        self,
+        marketplace: str,
+        query_text: str,
+        k: int = 50,
+        score_cutoff: Optional[float] = None,
+        token_prefilter: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k leaves by partial_ratio against the normalized query. score_cutoff (0-100)
+        drops weaker leaves inside rapidfuzz instead of returning them.
+
+        token_prefilter=True only scores leaves sharing at least one whole word with the
+        query (falling back to every leaf when fewer than k do). Much less work on large
+        taxonomies, but partial matches such as "drill" vs "drills" can drop out, so the
+        result may differ slightly from the full scan.
+        """
         mp = self.marketplaces.get(marketplace)
         if not mp or not mp.leaves:
             return []
 
-        corpus = [lf.tokens for lf in mp.leaves]
-        # partial_ratio handles short item titles well
-        result = process.extract(_norm(query_text), corpus, scorer=fuzz.partial_ratio, limit=min(k, len(corpus)))
-
-        picks: List[Dict[str, Any]] = []
-        for _, score, idx in result:
-            leaf = mp.leaves[idx]
-            picks.append({"id": leaf.id, "name": leaf.name, "path": leaf.path, "depth": leaf.depth, "score": int(score)})
-
-        # Deduplicate by path, keep highest score
+        q = _norm(query_text)
+        if not q:
+            # nothing to match: every leaf would score 0
+            return []
+        # Built at load; the same list object on every call
+        corpus = mp.corpus
+        candidates = None
+        if token_prefilter:
+            hits = [mp.postings[w] for w in set(q.split()) if w in mp.postings]
+            if hits:
+                # sorted, so ties keep leaf order as in the full scan
+                idx_arr = np.unique(np.concatenate(hits))
+                if idx_arr.size >= k:
+                    candidates = idx_arr.tolist()
+                    corpus = [corpus[i] for i in candidates]
+        # partial_ratio handles short item titles well. Query and corpus are both
+        # already _norm-ed, so no processor: rapidfuzz must not re-process the corpus.
+        result = process.extract(
+            q, corpus, scorer=fuzz.partial_ratio, processor=None, limit=min(k, len(corpus)), score_cutoff=score_cutoff
+        )
+
+        # Deduplicate by path, keep highest score: extract returns best-first,
+        # so the first hit for a path is already its best
         unique: Dict[str, Dict[str, Any]] = {}
-        for r in picks:
-            key = r["path"]
-            if key not in unique or r["score"] > unique[key]["score"]:
-                unique[key] = r
+        for _, score, idx in result:
+            leaf = mp.leaves[idx if candidates is None else candidates[idx]]
+            if leaf.path in unique:
+                continue
+            unique[leaf.path] = {"id": leaf.id, "name": leaf.name, "path": leaf.path, "depth": leaf.depth, "score": int(score)}
         return list(unique.values())
 
+    def shortlist_batch(self, marketplace: str, queries: Sequence[str], k: int = 50) -> List[List[Dict[str, Any]]]:
+        """
+        shortlist() for many queries at once: one cdist call scores every query against
+        the corpus in native code across all cores. Returns one result list per query,
+        ranked and scored exactly as shortlist() would.
+        """
+        mp = self.marketplaces.get(marketplace)
+        if not mp or not mp.leaves:
+            return [[] for _ in queries]
+        if not queries:
+            return []
+
+        corpus = mp.corpus
+        k = min(k, len(corpus))
+        normed = [_norm(q) for q in queries]
+        # blank queries get [] as in shortlist() and are not scored at all
+        scored = [q for q in normed if q]
+        if not scored:
+            return [[] for _ in queries]
+        rows = iter(
+            process.cdist(scored, corpus, scorer=fuzz.partial_ratio, processor=None, dtype=np.float64, workers=-1)
+        )
+        results: List[List[Dict[str, Any]]] = []
+        for q in normed:
+            if not q:
+                results.append([])
+                continue
+            row = next(rows)
+            # best first; a stable sort on the negated score keeps leaf order within ties
+            top = np.argsort(-row, kind="stable")[:k]
+            unique: Dict[str, Dict[str, Any]] = {}
+            for idx in top.tolist():
+                leaf = mp.leaves[idx]
+                if leaf.path in unique:
+                    continue
+                unique[leaf.path] = {"id": leaf.id, "name": leaf.name, "path": leaf.path, "depth": leaf.depth, "score": int(row[idx])}
+            results.append(list(unique.values()))
+        return results
+
 # ... existing imports ...
 
+@lru_cache(maxsize=65536)
 def _normalize_path(raw: str) -> str:
     """
     Normalize any taxonomy path to use ' > ' as the delimiter,
@@ -230,13 +358,9 @@ def _normalize_path(raw: str) -> str:
     """
     if not raw:
         return ""
-    s = str(raw).strip()
-
-    # unify common delimiters to '>'
-    # handles '/', ' / ', '>', ' > ', '→', '»', '|' etc.
-    s = re.sub(r"\s*[/|>→»]\s*", ">", s)
-    # collapse multiple '>' and spaces
-    parts = [p.strip() for p in s.split(">") if p.strip()]
+    # split on any of the delimiters in one pass; trimming each segment and dropping
+    # blank ones also collapses repeated delimiters and surrounding spaces
+    parts = [seg for p in _SEG_RE.findall(str(raw)) if (seg := p.strip())]
     if parts and parts[0].lower() == "root":
         parts = parts[1:]
     return " > ".join(parts)